@@ -4,4 +4,6 @@ __version__ = "0.3.1"
 __author__ = "pierrick rambaud"
 __email__ = "pierrick.rambaud49@gmail.com"
 
+from .mosaic import open_mosaic as open_mosaic
 from .vrt import build_vrt as build_vrt
+from .watch import VrtWatcher as VrtWatcher
@@ -24,3 +24,14 @@ resolutions = [
     "highest",
 ]
 "accepted resolutions in the res parameters"
+
+resamplings = [
+    "nearest",
+    "bilinear",
+    "cubic",
+    "cubicspline",
+    "lanczos",
+    "average",
+    "mode",
+]
+"accepted resampling methods in the vrt sources"
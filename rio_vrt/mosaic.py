@@ -0,0 +1,279 @@
+"""Dask based lazy reading of a mosaic."""
+
+from bisect import bisect_left, bisect_right
+from functools import partial
+from itertools import accumulate, product
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import rasterio as rio
+from rasterio.enums import ColorInterp, Resampling
+from rasterio.windows import Window
+
+from .vrt import _check_files, _get_dst_rect, _get_grid, _read_info
+
+if TYPE_CHECKING:
+    import xarray as xr
+
+Source = Tuple[Path, int, int, int, int, int, int]
+"the path, the (xoff, yoff, xsize, ysize) DstRect and the (width, height) SrcRect of a source"
+
+
+def _scan_sources(
+    files: List[Path], infos: List[dict], transform: rio.Affine
+) -> Tuple[List[Source], List[Tuple[int, int, int]], List[Tuple[int, int, int]]]:
+    """Locate each file in the mosaic grid.
+
+    Returns:
+        the sources records and their (offset, size, blocksize) along the x and y axis
+    """
+    xres, yres = transform.a, -transform.e
+
+    sources, xaxis, yaxis = [], [], []
+    for file, info in zip(files, infos):
+        xoff, yoff, xsize, ysize = _get_dst_rect(info, transform)
+
+        # express the blocks in mosaic pixels for files with a different resolution
+        blocky, blockx = info["block_shape"]
+        blockx = max(1, round(blockx * info["res"][0] / xres))
+        blocky = max(1, round(blocky * info["res"][1] / yres))
+
+        width, height = info["width"], info["height"]
+        sources.append((file, xoff, yoff, xsize, ysize, width, height))
+        xaxis.append((xoff, xsize, blockx))
+        yaxis.append((yoff, ysize, blocky))
+
+    return sources, xaxis, yaxis
+
+
+def _axis_chunks(
+    axis: List[Tuple[int, int, int]], size: int, chunksize: int
+) -> Tuple[int, ...]:
+    """Split an axis of the mosaic in chunks aligned on the sources edges and blocks.
+
+    The axis is first cut on every source edge so that each chunk is covered by a
+    constant set of files. Large spans are then subdivided on the block grid of the
+    first file covering them, using the largest multiple of its blocksize that fits in
+    chunksize. Blocks larger than chunksize are cut so no chunk exceeds chunksize.
+    """
+    edges = {0, size}
+    for offset, length, _ in axis:
+        edges.update(min(max(e, 0), size) for e in (offset, offset + length))
+    edges_ = sorted(edges)
+
+    chunks = []
+    for start, end in zip(edges_[:-1], edges_[1:]):
+        origin, step = start, chunksize
+        for offset, length, block in axis:
+            if offset <= start < offset + length:
+                step = chunksize // block * block if block <= chunksize else chunksize
+                origin = offset
+                break
+
+        cut = start
+        while cut < end:
+            next_cut = min(origin + ((cut - origin) // step + 1) * step, end)
+            chunks.append(next_cut - cut)
+            cut = next_cut
+
+    return tuple(chunks)
+
+
+def _chunk_sources(
+    sources: List[Source], ychunks: Tuple[int, ...], xchunks: Tuple[int, ...]
+) -> Dict[Tuple[int, int], List[Source]]:
+    """Gather the sources intersecting each (row, col) chunk, keeping their order."""
+    yedges = list(accumulate(ychunks))
+    xedges = list(accumulate(xchunks))
+
+    chunk_sources: Dict[Tuple[int, int], List[Source]] = {
+        c: [] for c in product(range(len(ychunks)), range(len(xchunks)))
+    }
+    for source in sources:
+        _, xoff, yoff, xsize, ysize, _, _ = source
+        if xsize <= 0 or ysize <= 0:
+            continue
+        rows = range(bisect_right(yedges, yoff), bisect_left(yedges, yoff + ysize) + 1)
+        cols = range(bisect_right(xedges, xoff), bisect_left(xedges, xoff + xsize) + 1)
+        for c in product(rows, cols):
+            if c in chunk_sources:
+                chunk_sources[c].append(source)
+
+    return chunk_sources
+
+
+def _read_chunk(
+    sources: List[Source],
+    rows: Tuple[int, int],
+    cols: Tuple[int, int],
+    indexes: Sequence[int],
+    dtype: str,
+    nodatavals: Sequence[Optional[float]],
+    colorinterps: Sequence[ColorInterp],
+    resampling: Resampling,
+) -> np.ndarray:
+    """Read a chunk of the mosaic from the sources intersecting it.
+
+    The sources are composited in order as in the vrt: the pixels of a band are only
+    written if they are different from the nodata value or, for alpha bands, valid in
+    the dataset mask.
+    """
+    (y0, y1), (x0, x1) = rows, cols
+    bands = indexes
+
+    # initialize the chunk with the nodata values
+    out = np.zeros((len(bands), y1 - y0, x1 - x0), dtype=dtype)
+    for k, i in enumerate(bands):
+        if nodatavals[i - 1] is not None:
+            out[k] = nodatavals[i - 1]
+
+    for file, xoff, yoff, xsize, ysize, src_width, src_height in sources:
+        # skip the sources that are not intersecting the chunk
+        ix0, ix1 = max(x0, xoff), min(x1, xoff + xsize)
+        iy0, iy1 = max(y0, yoff), min(y1, yoff + ysize)
+        if ix0 >= ix1 or iy0 >= iy1:
+            continue
+
+        # map the chunk pixels to the source pixels with the DstRect to SrcRect ratio
+        # as GDAL does, the fractional window keeps the sampling independent of the chunks
+        width, height = ix1 - ix0, iy1 - iy0
+        xratio, yratio = src_width / xsize, src_height / ysize
+        window = Window(
+            (ix0 - xoff) * xratio,
+            (iy0 - yoff) * yratio,
+            width * xratio,
+            height * yratio,
+        )
+        with rio.open(file) as src:
+            kwargs = {
+                "window": window,
+                "out_shape": (len(bands), height, width),
+                "resampling": resampling,
+            }
+            data = src.read(bands, **kwargs)
+
+            # the mask of an alpha band is all valid, use the dataset mask instead
+            is_alpha = [colorinterps[i - 1] == ColorInterp.alpha for i in bands]
+            mask = None
+            if any(is_alpha):
+                mask = src.dataset_mask(window=window, out_shape=(height, width))
+
+        target = out[:, iy0 - y0 : iy1 - y0, ix0 - x0 : ix1 - x0]
+        for k, i in enumerate(bands):
+            nodata = nodatavals[i - 1]
+            if nodata is not None and np.isnan(nodata):
+                valid = ~np.isnan(data[k])
+            elif nodata is not None:
+                valid = data[k] != nodata
+            elif is_alpha[k] and mask is not None:
+                valid = mask > 0
+            else:
+                valid = np.ones((height, width), dtype=bool)
+            target[k][valid] = data[k][valid]
+
+    return out
+
+
+def open_mosaic(
+    files: List[Union[str, Path]],
+    res: Union[str, Tuple[float, float]] = "average",
+    chunksize: int = 1024,
+    resampling: str = "nearest",
+) -> "xr.DataArray":
+    """Open multiple files as a single lazy mosaic.
+
+    The mosaic is using the same grid as the vrt created by :py:func:`build_vrt` but the files are read directly by dask without any GDAL vrt parsing. The chunks are aligned on the files edges and on their internal blocks so that each task only opens the few files intersecting it.
+
+    .. note::
+        This method requires the optional ``dask`` and ``xarray`` dependencies.
+
+    Arguments:
+        files: a list of rasterio readable files
+        res: The resolution to use in the mosaic geotransform. You can use a string (average, highest or lowest) or use a defined tuple of values (xres, yres).
+        chunksize: the maximum size of the chunks in pixels along each axis. The chunks are also cut on the files edges and internal blocks so they can be smaller.
+        resampling: The resampling method used to read the files that don't match the mosaic resolution, see :py:func:`build_vrt`.
+
+    Returns:
+        a dask backed xarray DataArray with (band, y, x) dimensions
+    """
+    try:
+        import dask.array as da
+        import xarray as xr
+        from dask.base import tokenize
+    except ImportError as e:
+        raise ImportError(
+            'open_mosaic requires dask and xarray, install them with "pip install rio-vrt[mosaic]"'
+        ) from e
+
+    # transform all the file path into Path objects
+    paths = [Path(f).resolve() for f in files]
+
+    # read the information of all the files only once
+    infos = [_read_info(f) for f in paths]
+
+    # check that the files can be gathered together
+    _check_files(paths, infos, res, resampling=resampling)
+
+    # read global informations from the first file
+    crs = infos[0]["crs"]
+    dtypes = infos[0]["dtypes"]
+    colorinterps = infos[0]["colorinterps"]
+    indexes = infos[0]["indexes"]
+    nodatavals = infos[0]["nodatavals"]
+
+    # a dask array has a single dtype for all the bands
+    if len(set(dtypes)) > 1:
+        raise ValueError(
+            f'the bands of file "{paths[0]}" have different dtypes ({dtypes}), they cannot be gathered in a single mosaic'
+        )
+    dtype = dtypes[0]
+
+    # locate the files in the mosaic grid and align the chunks on them
+    transform, width, height = _get_grid(infos, res)
+    sources, xaxis, yaxis = _scan_sources(paths, infos, transform)
+    chunks = (
+        (len(indexes),),
+        _axis_chunks(yaxis, height, chunksize),
+        _axis_chunks(xaxis, width, chunksize),
+    )
+
+    # each task only embeds the few sources intersecting its chunk
+    read_chunk = partial(
+        _read_chunk,
+        indexes=indexes,
+        dtype=dtype,
+        nodatavals=nodatavals,
+        colorinterps=colorinterps,
+        resampling=Resampling[resampling],
+    )
+    _, ychunks, xchunks = chunks
+    ystarts = [0, *accumulate(ychunks)]
+    xstarts = [0, *accumulate(xchunks)]
+    name = f"open_mosaic-{tokenize(sources, res, resampling, chunks)}"
+    dsk = {
+        (name, 0, r, c): (
+            read_chunk,
+            subset,
+            (ystarts[r], ystarts[r + 1]),
+            (xstarts[c], xstarts[c + 1]),
+        )
+        for (r, c), subset in _chunk_sources(sources, ychunks, xchunks).items()
+    }
+    data = da.Array(dsk, name, chunks, dtype=dtype)
+
+    # pixel centers coordinates
+    xres, yres = transform.a, -transform.e
+    x = transform.c + (np.arange(width) + 0.5) * xres
+    y = transform.f - (np.arange(height) + 0.5) * yres
+
+    attrs = {"crs": crs.to_wkt(), "transform": tuple(transform)[:6]}
+    if nodatavals[0] is not None:
+        attrs["_FillValue"] = nodatavals[0]
+
+    return xr.DataArray(
+        data,
+        dims=("band", "y", "x"),
+        coords={"band": list(indexes), "y": y, "x": x},
+        attrs=attrs,
+    )
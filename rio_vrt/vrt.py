@@ -10,16 +10,52 @@ from xml.dom import minidom
 import rasterio as rio
 from rasterio.enums import ColorInterp
 
-from .enums import resolutions, types
+from .enums import resamplings, resolutions, types
+
+
+def _read_info(file: Path) -> dict:
+    """Read once all the information of a file needed to add it in a vrt."""
+    with rio.open(file) as f:
+        return {
+            "crs": f.crs,
+            "count": f.count,
+            "dtypes": f.dtypes,
+            "colorinterps": f.colorinterp,
+            "indexes": f.indexes,
+            "nodatavals": f.nodatavals,
+            "res": f.res,
+            "bounds": f.bounds,
+            "width": f.width,
+            "height": f.height,
+            "blockxsize": f.profile.get("blockxsize", ""),
+            "blockysize": f.profile.get("blockysize", ""),
+            "block_shape": f.block_shapes[0],
+        }
+
+
+def _get_dst_rect(info: dict, transform: rio.Affine) -> Tuple[int, int, int, int]:
+    """Compute the position (xoff, yoff, xsize, ysize) of a file in the vrt grid.
+
+    The size is computed from the file bounds so that files with a different resolution than the vrt are scaled to their real extend.
+    """
+    left, top, xres, yres = transform.c, transform.f, transform.a, -transform.e
+    bounds = info["bounds"]
+
+    xoff = abs(round((bounds.left - left) / xres))
+    yoff = abs(round((bounds.top - top) / yres))
+    xsize = abs(round((bounds.right - left) / xres)) - xoff
+    ysize = abs(round((bounds.bottom - top) / yres)) - yoff
+
+    return xoff, yoff, xsize, ysize
 
 
 def _add_source_content(
-    Source: ET.Element, src: rio.DatasetReader, type: str, xoff: str, yoff: str
+    Source: ET.Element, info: dict, type: str, transform: rio.Affine
 ) -> None:
     """Add the content of a sourcefile in xml."""
-    width, height = str(src.width), str(src.height)
-    blockx = str(src.profile.get("blockxsize", ""))
-    blocky = str(src.profile.get("blockysize", ""))
+    width, height = str(info["width"]), str(info["height"])
+    blockx = str(info["blockxsize"])
+    blocky = str(info["blockysize"])
 
     attr = {
         "RasterXSize": width,
@@ -36,35 +72,19 @@ def _add_source_content(
     attr = {"xOff": "0", "yOff": "0", "xSize": width, "ySize": height}
     ET.SubElement(Source, "SrcRect", attr)
 
-    attr = {"xOff": xoff, "yOff": yoff, "xSize": width, "ySize": height}
+    xoff, yoff, xsize, ysize = [str(i) for i in _get_dst_rect(info, transform)]
+    attr = {"xOff": xoff, "yOff": yoff, "xSize": xsize, "ySize": ysize}
     ET.SubElement(Source, "DstRect", attr)
 
 
-def build_vrt(
-    vrt_path: Union[str, Path],
-    files: List[Union[str, Path]],
-    relative: bool = False,
+def _check_files(
+    files: List[Path],
+    infos: List[dict],
+    res: Union[str, Tuple[float, float]],
     mosaic: bool = True,
-    res: Union[str, Tuple[float, float]] = "average",
-) -> Path:
-    """Create a vrt file from multiple files.
-
-    Arguments:
-        vrt_path: the final vrt file
-        files: a list of rasterio readable files
-        relative: use a path relative to the vrt file. The files path must be relative to the vrt.
-        mosaic: The method to use to gather images in the vrt. ``MOSAIC`` (True) will mosaic each band of each image together. ``STACK`` (False) will create one band for each file using the first band of each file.*
-        res: The resolution to use in the vrt geotransform. You can use a string (average, highest or lowest) or use a defined tuple of values (xres, yres).
-
-    Returns:
-        the path to the vrt file
-    """
-    # transform the final file in Path
-    vrt_path = Path(vrt_path).resolve()
-
-    # transform all the file path into Path objects
-    files = [Path(f).resolve() for f in files]
-
+    resampling: str = "nearest",
+) -> None:
+    """Raise an error if the files and the resolution cannot be gathered in a single grid."""
     # cannot do anything if there are no files
     if len(files) == 0:
         raise ValueError("There should be at least 1 file to create a vrt.")
@@ -75,54 +95,53 @@ def build_vrt(
             'the provided resolution cannot be use: "{res}", please use one of the existing keywords'
         )
 
+    # check the resampling value
+    if resampling not in resamplings:
+        raise ValueError(
+            f'the provided resampling cannot be use: "{resampling}", please use one of {resamplings}'
+        )
+
     # read global informations from the first file
-    with rio.open(files[0]) as f:
-        crs = f.crs
-        count = f.count
-        dtypes = f.dtypes
-        colorinterps = f.colorinterp
-        indexes = f.indexes
-        nodatavals = f.nodatavals
-
-    # for stacks replace count and indexes as we only take the first band
-    if not mosaic:
-        count, indexes = len(files), [1]
+    crs, count = infos[0]["crs"], infos[0]["count"]
 
     # sanity checks
-    for file in files:
-        with rio.open(file) as f:
-            if f.crs != crs:
-                raise ValueError(
-                    f'the crs ({f.crs}) from file "{file}" is not corresponding to the global one ({crs})'
-                )
-
-            if mosaic and f.count != count:
-                raise ValueError(
-                    f'the crs ({f.count}) from file "{file}" is not corresponding to the global one ({count})'
-                )
-
+    for file, info in zip(files, infos):
+        if info["crs"] != crs:
+            raise ValueError(
+                f'the crs ({info["crs"]}) from file "{file}" is not corresponding to the global one ({crs})'
+            )
+
+        if mosaic and info["count"] != count:
+            raise ValueError(
+                f'the crs ({info["count"]}) from file "{file}" is not corresponding to the global one ({count})'
+            )
+
+
+def _get_grid(
+    infos: List[dict], res: Union[str, Tuple[float, float]]
+) -> Tuple[rio.Affine, int, int]:
+    """Compute the transform and the size of the grid covering all the files."""
     # read all files to extract information on the spatial extend of the vrt
     left_, bottom_, right_, top_, xres_, yres_ = [], [], [], [], [], []
-    for file in files:
-        with rio.open(file) as f:
-            xres_.append(f.res[0])
-            yres_.append(f.res[0])
-            left_.append(f.bounds.left)
-            right_.append(f.bounds.right)
-            top_.append(f.bounds.top)
-            bottom_.append(f.bounds.bottom)
+    for info in infos:
+        xres_.append(info["res"][0])
+        yres_.append(info["res"][1])
+        left_.append(info["bounds"].left)
+        right_.append(info["bounds"].right)
+        top_.append(info["bounds"].top)
+        bottom_.append(info["bounds"].bottom)
 
     # get the spatial extend of the dataset
-    left = min(*left_)
-    bottom = min(*bottom_)
-    right = max(*right_)
-    top = max(*top_)
+    left = min(left_)
+    bottom = min(bottom_)
+    right = max(right_)
+    top = max(top_)
 
-    # get the resolution
+    # get the resolution, the highest resolution is the smallest pixel size
     if res == "highest":
-        xres, yres = max(*xres_), max(*yres_)
+        xres, yres = min(xres_), min(yres_)
     elif res == "lowest":
-        xres, yres = min(*xres_), min(*yres_)
+        xres, yres = max(xres_), max(yres_)
     elif res == "average":
         xres, yres = mean(xres_), mean(yres_)
     elif isinstance(res, tuple):
@@ -134,6 +153,39 @@ def build_vrt(
     total_width = round((right - left) / xres)
     total_height = round((top - bottom) / yres)
 
+    return transform, total_width, total_height
+
+
+def _vrt_text(
+    vrt_path: Path,
+    files: List[Path],
+    infos: List[dict],
+    relative: bool = False,
+    mosaic: bool = True,
+    res: Union[str, Tuple[float, float]] = "average",
+    resampling: str = "nearest",
+) -> str:
+    """Create the xml content of a vrt from the information of already read files."""
+    # check that the files can be gathered together
+    _check_files(files, infos, res, mosaic, resampling)
+
+    # nearest is the GDAL default, only write the other resampling methods in the sources
+    source_attr = {} if resampling == "nearest" else {"resampling": resampling}
+
+    # read global informations from the first file
+    crs = infos[0]["crs"]
+    dtypes = infos[0]["dtypes"]
+    colorinterps = infos[0]["colorinterps"]
+    indexes = infos[0]["indexes"]
+    nodatavals = infos[0]["nodatavals"]
+
+    # for stacks replace indexes as we only take the first band
+    if not mosaic:
+        indexes = [1]
+
+    # compute the grid of the vrt from the spatial extend of all the files
+    transform, total_width, total_height = _get_grid(infos, res)
+
     # start the tree
     attr = {"rasterXSize": str(total_width), "rasterYSize": str(total_height)}
     VRTDataset = ET.Element("VRTDataset", attr)
@@ -171,47 +223,45 @@ def build_vrt(
                 ET.SubElement(VRTRasterBands_dict[i], "NoDataValue").text = text
 
         # add the files
-        for f in files:
+        for f, info in zip(files, infos):
             relativeToVRT = "1" if relative is True else "0"
-            with rio.open(f) as src:
-                for i in indexes:
-                    is_alpha = colorinterps[i - 1] == ColorInterp.alpha
-                    has_nodata = nodatavals[i - 1] is not None
-                    source_type = (
-                        "ComplexSource" if is_alpha or has_nodata else "SimpleSource"
-                    )
-                    Source = ET.SubElement(VRTRasterBands_dict[i], source_type)
-
-                    attr = {"relativeToVRT": relativeToVRT}
-                    text = str(f) if not relative else relpath(f, vrt_path.parent)
-                    ET.SubElement(Source, "SourceFilename", attr).text = text
-
-                    ET.SubElement(Source, "SourceBand").text = str(i)
-
-                    _add_source_content(
-                        Source=Source,
-                        src=src,
-                        type=types[dtypes[i - 1]],
-                        xoff=str(abs(round((src.bounds.left - left) / xres))),
-                        yoff=str(abs(round((src.bounds.top - top) / yres))),
-                    )
-
-                    if nodatavals[i - 1] is not None:
-                        text = str(nodatavals[i - 1])
-                        ET.SubElement(Source, "NODATA").text = text
-
-                    if colorinterps[i - 1] == ColorInterp.alpha:
-                        ET.SubElement(Source, "UseMaskBand").text = "true"
+            for i in indexes:
+                is_alpha = colorinterps[i - 1] == ColorInterp.alpha
+                has_nodata = nodatavals[i - 1] is not None
+                source_type = (
+                    "ComplexSource" if is_alpha or has_nodata else "SimpleSource"
+                )
+                Source = ET.SubElement(VRTRasterBands_dict[i], source_type, source_attr)
+
+                attr = {"relativeToVRT": relativeToVRT}
+                text = str(f) if not relative else relpath(f, vrt_path.parent)
+                ET.SubElement(Source, "SourceFilename", attr).text = text
+
+                ET.SubElement(Source, "SourceBand").text = str(i)
+
+                _add_source_content(
+                    Source=Source,
+                    info=info,
+                    type=types[dtypes[i - 1]],
+                    transform=transform,
+                )
+
+                if nodatavals[i - 1] is not None:
+                    text = str(nodatavals[i - 1])
+                    ET.SubElement(Source, "NODATA").text = text
+
+                if colorinterps[i - 1] == ColorInterp.alpha:
+                    ET.SubElement(Source, "UseMaskBand").text = "true"
 
     # in stacked vrt, each file is added as a single band and only the first band is
     # considered. They are all complex sources to make sure GIS softwares don't do funny
     # display upon reading
     elif not mosaic:
-        for i, f in enumerate(files):
+        for i, (f, info) in enumerate(zip(files, infos)):
             attr = {"dataType": types[dtypes[0]], "band": str(i)}
             VRTRasterBands = ET.SubElement(VRTDataset, "VRTRasterBand", attr)
 
-            ComplexSource = ET.SubElement(VRTRasterBands, "ComplexSource")
+            ComplexSource = ET.SubElement(VRTRasterBands, "ComplexSource", source_attr)
 
             relativeToVRT = "1" if relative is True else "0"
             attr = {"relativeToVRT": relativeToVRT}
@@ -220,20 +270,53 @@ def build_vrt(
 
             ET.SubElement(ComplexSource, "SourceBand").text = "1"
 
-            with rio.open(f) as src:
-                _add_source_content(
-                    Source=ComplexSource,
-                    src=src,
-                    type=types[dtypes[0]],
-                    xoff=str(abs(round((src.bounds.left - left) / xres))),
-                    yoff=str(abs(round((src.bounds.top - top) / yres))),
-                )
+            _add_source_content(
+                Source=ComplexSource,
+                info=info,
+                type=types[dtypes[0]],
+                transform=transform,
+            )
 
-    # write the file
-    vrt_path.resolve().write_text(
+    return (
         minidom.parseString(ET.tostring(VRTDataset).decode("utf-8"))
         .toprettyxml(indent="  ")
         .replace("&quot;", '"')
     )
 
+
+def build_vrt(
+    vrt_path: Union[str, Path],
+    files: List[Union[str, Path]],
+    relative: bool = False,
+    mosaic: bool = True,
+    res: Union[str, Tuple[float, float]] = "average",
+    resampling: str = "nearest",
+) -> Path:
+    """Create a vrt file from multiple files.
+
+    Arguments:
+        vrt_path: the final vrt file
+        files: a list of rasterio readable files
+        relative: use a path relative to the vrt file. The files path must be relative to the vrt.
+        mosaic: The method to use to gather images in the vrt. ``MOSAIC`` (True) will mosaic each band of each image together. ``STACK`` (False) will create one band for each file using the first band of each file.*
+        res: The resolution to use in the vrt geotransform. You can use a string (average, highest or lowest) or use a defined tuple of values (xres, yres).
+        resampling: The resampling method used by GDAL to read the sources that don't match the vrt resolution (nearest, bilinear, cubic, cubicspline, lanczos, average or mode).
+
+    Returns:
+        the path to the vrt file
+    """
+    # transform the final file in Path
+    vrt_path = Path(vrt_path).resolve()
+
+    # transform all the file path into Path objects
+    paths = [Path(f).resolve() for f in files]
+
+    # read the information of all the files only once
+    infos = [_read_info(f) for f in paths]
+
+    # write the file
+    vrt_path.write_text(
+        _vrt_text(vrt_path, paths, infos, relative, mosaic, res, resampling)
+    )
+
     return vrt_path
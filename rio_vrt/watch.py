@@ -0,0 +1,232 @@
+"""Keep a vrt in sync with the content of a directory."""
+
+import logging
+import os
+import stat
+import threading
+import time
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+from uuid import uuid4
+
+from rasterio.errors import RasterioIOError
+
+from .vrt import _read_info, _vrt_text
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+logger = logging.getLogger(__name__)
+
+
+class VrtWatcher:
+    """Watch a directory and keep a vrt continuously in sync with the files it contains.
+
+    Only the files that have been added or modified since the last update are read again, the information of all the others are kept in memory. Files that cannot be gathered with the others (different crs or band count) are left out of the vrt with a logged warning. The vrt is written in a temporary file that replaces the final one so that readers never open a half written vrt. If all the files are removed from the directory, the last vrt is kept as a vrt cannot be empty.
+
+    Arguments:
+        vrt_path: the final vrt file
+        directory: the directory to watch
+        pattern: the glob pattern of the files to include in the vrt
+        relative: use a path relative to the vrt file.
+        mosaic: The method to use to gather images in the vrt, see :py:func:`build_vrt`.
+        res: The resolution to use in the vrt geotransform, see :py:func:`build_vrt`.
+        resampling: The resampling method written in the vrt sources, see :py:func:`build_vrt`.
+        interval: the time in seconds between 2 checks of the directory
+        debounce: the time in seconds the directory should remain unchanged before updating the vrt
+        use_inotify: use inotify events instead of polling the directory. By default it is used when ``inotify_simple`` is installed.
+    """
+
+    def __init__(
+        self,
+        vrt_path: Union[str, Path],
+        directory: Union[str, Path],
+        pattern: str = "*.tif",
+        relative: bool = False,
+        mosaic: bool = True,
+        res: Union[str, Tuple[float, float]] = "average",
+        resampling: str = "nearest",
+        interval: float = 1.0,
+        debounce: float = 2.0,
+        use_inotify: Optional[bool] = None,
+    ) -> None:
+        """Initialize the watcher without reading the directory."""
+        self.vrt_path = Path(vrt_path).resolve()
+        self.directory = Path(directory).resolve()
+        self.pattern = pattern
+        self.relative = relative
+        self.mosaic = mosaic
+        self.res = res
+        self.resampling = resampling
+        self.interval = interval
+        self.debounce = debounce
+
+        if use_inotify and INotify is None:
+            raise ImportError(
+                'inotify watching requires inotify_simple, install it with "pip install rio-vrt[watch]"'
+            )
+        self.use_inotify = INotify is not None if use_inotify is None else use_inotify
+
+        # signature and information of the files currently written in the vrt
+        self._stats: Dict[Path, Tuple[int, int]] = {}
+        self._infos: Dict[Path, dict] = {}
+
+        self._stop = threading.Event()
+
+    def _listing(self) -> Dict[Path, Tuple[int, int]]:
+        """Return the (mtime, size) signature of the files matching the pattern."""
+        stats = {}
+        for file in self.directory.glob(self.pattern):
+            if file == self.vrt_path or not file.is_file():
+                continue
+            # the file can be removed between the listing and the stat
+            try:
+                file_stat = file.stat()
+            except FileNotFoundError:
+                continue
+            stats[file] = (file_stat.st_mtime_ns, file_stat.st_size)
+
+        return stats
+
+    def _write(self, file_infos: Dict[Path, dict]) -> None:
+        """Atomically replace the vrt with the given files."""
+        # a vrt needs at least 1 file, keep the last valid one for the readers
+        if len(file_infos) == 0:
+            logger.warning(
+                f'no file left in "{self.directory}", the last vrt "{self.vrt_path}" is kept'
+            )
+            return
+
+        files = sorted(file_infos)
+        infos = [file_infos[f] for f in files]
+        text = _vrt_text(
+            self.vrt_path,
+            files,
+            infos,
+            self.relative,
+            self.mosaic,
+            self.res,
+            self.resampling,
+        )
+
+        # write in the same directory to make sure the rename is atomic. The file is
+        # created like a regular one (respecting the umask) and keeps the mode of the
+        # existing vrt if any
+        tmp = self.vrt_path.with_name(f".{self.vrt_path.name}.{uuid4().hex}.tmp")
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            with os.fdopen(fd, "w") as f:
+                f.write(text)
+            if self.vrt_path.exists():
+                os.chmod(tmp, stat.S_IMODE(self.vrt_path.stat().st_mode))
+            os.replace(tmp, self.vrt_path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    def update(self) -> bool:
+        """Read the added and modified files and rewrite the vrt if something changed.
+
+        Returns:
+            True if the files of the directory changed since the last update
+        """
+        stats = self._listing()
+        changed = [f for f, s in stats.items() if self._stats.get(f) != s]
+        removed = [f for f in self._stats if f not in stats]
+        if len(changed) == 0 and len(removed) == 0:
+            return False
+
+        # work on a copy so that the state is only saved once the vrt is written
+        file_infos = {f: i for f, i in self._infos.items() if f in stats}
+        for file in changed:
+            file_infos.pop(file, None)
+
+        # files that cannot be read yet are ignored until their next modification
+        new_infos = {}
+        for file in sorted(changed):
+            try:
+                new_infos[file] = _read_info(file)
+            except RasterioIOError:
+                logger.warning(f'"{file}" cannot be read, it is left out of the vrt')
+
+        # the files already in the vrt, or the first new one, define the reference
+        # crs and band count, incompatible files are left out instead of stopping the watch
+        reference = next(iter(file_infos.values()), None)
+        for file, info in new_infos.items():
+            reference = reference or info
+            if info["crs"] != reference["crs"]:
+                msg = f'the crs ({info["crs"]}) from file "{file}" is not corresponding to the global one ({reference["crs"]}), it is left out of the vrt'
+                logger.warning(msg)
+            elif self.mosaic and info["count"] != reference["count"]:
+                msg = f'the band count ({info["count"]}) from file "{file}" is not corresponding to the global one ({reference["count"]}), it is left out of the vrt'
+                logger.warning(msg)
+            else:
+                file_infos[file] = info
+
+        self._write(file_infos)
+        self._stats, self._infos = stats, file_infos
+
+        return True
+
+    def _try_update(self) -> bool:
+        """Update the vrt, logging the errors instead of raising them.
+
+        Returns:
+            False if the update failed and should be retried
+        """
+        try:
+            self.update()
+        except Exception:
+            logger.exception(f'the vrt "{self.vrt_path}" cannot be updated, retrying')
+            return False
+
+        return True
+
+    def run(self) -> None:
+        """Watch the directory until :py:meth:`stop` is called.
+
+        Errors raised while updating the vrt are logged and the update is retried on the next check so that the watch never stops on a transient error.
+        """
+        self._stop.clear()
+        pending = not self._try_update()
+
+        inotify = None
+        if self.use_inotify:
+            inotify = INotify()
+            mask = (
+                flags.CREATE
+                | flags.CLOSE_WRITE
+                | flags.DELETE
+                | flags.MOVED_FROM
+                | flags.MOVED_TO
+            )
+            inotify.add_watch(self.directory, mask)
+
+        # the vrt is only updated once the directory has been quiet for debounce seconds
+        last_stats, last_change = self._stats, time.monotonic()
+        try:
+            while not self._stop.is_set():
+                if inotify is not None:
+                    events = inotify.read(timeout=int(self.interval * 1000))
+                    if any(fnmatch(e.name, self.pattern) for e in events):
+                        last_change, pending = time.monotonic(), True
+                else:
+                    self._stop.wait(self.interval)
+                    stats = self._listing()
+                    if stats != last_stats:
+                        last_stats, last_change = stats, time.monotonic()
+                    pending = stats != self._stats
+
+                if pending and time.monotonic() - last_change >= self.debounce:
+                    pending = not self._try_update()
+                    last_stats = self._stats
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def stop(self) -> None:
+        """Stop watching the directory."""
+        self._stop.set()
@@ -1,4 +1,8 @@
 """Test the rio_vrt package."""
+import os
+import shutil
+import threading
+import time
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 from typing import List
@@ -10,6 +14,7 @@ import rasterio as rio
 import xmlschema
 from bs4 import BeautifulSoup
 from rasterio.crs import CRS
+from rasterio.enums import ColorInterp, Resampling
 
 import rio_vrt
 
@@ -168,3 +173,479 @@ def test_vrt_resolutions(
         file = rio_vrt.build_vrt(vrt_path.name, tiles, relative=True, res=res)
         vrt_tree = BeautifulSoup(file.read_text(), "xml").prettify()
         file_regression.check(vrt_tree, basename=f"{res}_vrt", extension=".vrt")
+
+
+def _write_tile(path: Path, data: np.ndarray, col_off: int, **kwargs) -> Path:
+    """Write a small tile shifted by col_off pixels on a common grid.
+
+    Args:
+        path: the tile path
+        data: the (band, row, col) data of the tile
+        col_off: the column offset of the tile on the grid
+        kwargs: extra profile parameters
+
+    Returns:
+        the tile path
+    """
+    count, height, width = data.shape
+    profile = {
+        "driver": "GTiff",
+        "width": width,
+        "height": height,
+        "count": count,
+        "dtype": data.dtype.name,
+        "crs": CRS.from_epsg(32618),
+        "transform": rio.Affine(10, 0, col_off * 10, 0, -10, 0),
+        **kwargs,
+    }
+    with rio.open(path, "w", **profile) as dst:
+        dst.write(data)
+
+    return path
+
+
+def test_open_mosaic(tiles: List[Path], data_dir: Path, tmp_path: Path) -> None:
+    """Test that the lazy mosaic is reading the same values as the vrt.
+
+    Args:
+        tiles: the list of tile path
+        data_dir: the data directory
+        tmp_path: the pytest temporary directory
+    """
+    # filter only the pair tiles to get some holes in the mosaic
+    tiles = [t for i, t in enumerate(tiles) if i % 2]
+    with NamedTemporaryFile(suffix=".vrt", dir=data_dir) as vrt_path:
+        vrt_file = rio_vrt.build_vrt(vrt_path.name, tiles)
+        with rio.open(vrt_file) as src:
+            expected = src.read()
+            transform = src.transform
+
+    mosaic = rio_vrt.open_mosaic(tiles)
+    assert mosaic.shape == expected.shape
+    assert mosaic.attrs["transform"] == tuple(transform)[:6]
+    assert np.array_equal(mosaic.values, expected)
+
+    # overlapping float tiles using nan as nodata
+    left = np.ones((1, 10, 10), dtype="float32")
+    right = np.full((1, 10, 10), 2, dtype="float32")
+    right[:, :, :5] = np.nan
+    files = [
+        _write_tile(tmp_path / "left.tif", left, 0, nodata=np.nan),
+        _write_tile(tmp_path / "right.tif", right, 5, nodata=np.nan),
+    ]
+    with rio.open(rio_vrt.build_vrt(tmp_path / "nan.vrt", files)) as src:
+        expected = src.read()
+
+    mosaic = rio_vrt.open_mosaic(files)
+    assert np.array_equal(mosaic.values[0, 0], [1] * 10 + [2] * 5)
+    assert np.array_equal(mosaic.values, expected, equal_nan=True)
+
+    # overlapping gray tiles with an alpha band
+    left = np.stack([np.full((10, 10), 10), np.full((10, 10), 255)]).astype("uint8")
+    right = np.stack([np.full((10, 10), 20), np.full((10, 10), 255)]).astype("uint8")
+    right[1, :, :5] = 0
+    files = []
+    for name, data, col_off in [("left", left, 0), ("right", right, 5)]:
+        file = _write_tile(tmp_path / f"{name}_alpha.tif", data, col_off)
+        with rio.open(file, "r+") as dst:
+            dst.colorinterp = [ColorInterp.gray, ColorInterp.alpha]
+        files.append(file)
+
+    with rio.open(rio_vrt.build_vrt(tmp_path / "alpha.vrt", files)) as src:
+        expected = src.read()
+
+    mosaic = rio_vrt.open_mosaic(files)
+    assert np.array_equal(mosaic.values[1, 0], [255] * 15)
+    assert np.array_equal(mosaic.values, expected)
+
+
+def test_open_mosaic_mixed_dtypes(tmp_path: Path) -> None:
+    """Test that a file with mixed band dtypes cannot be opened as a mosaic.
+
+    Args:
+        tmp_path: the pytest temporary directory
+    """
+    tile = _write_tile(tmp_path / "tile.tif", np.ones((1, 10, 10), "uint8"), 0)
+
+    # a vrt is the simplest way to get a raster with one dtype per band
+    bands = ""
+    for i, dtype in enumerate(["Byte", "Float32"], start=1):
+        bands += f"""
+  <VRTRasterBand dataType="{dtype}" band="{i}">
+    <SimpleSource>
+      <SourceFilename relativeToVRT="0">{tile}</SourceFilename>
+      <SourceBand>1</SourceBand>
+    </SimpleSource>
+  </VRTRasterBand>"""
+    mixed = tmp_path / "mixed.vrt"
+    mixed.write_text(f"""<VRTDataset rasterXSize="10" rasterYSize="10">
+  <SRS>{CRS.from_epsg(32618).wkt}</SRS>
+  <GeoTransform>0, 10, 0, 0, 0, -10</GeoTransform>{bands}
+</VRTDataset>""")
+
+    with pytest.raises(ValueError, match="dtypes"):
+        rio_vrt.open_mosaic([mixed])
+
+
+def test_open_mosaic_chunks(tiles: List[Path]) -> None:
+    """Test that the chunks of the lazy mosaic are aligned on the tiles edges.
+
+    Args:
+        tiles: the list of tile path
+    """
+    mosaic = rio_vrt.open_mosaic(tiles, chunksize=100)
+    _, ychunks, xchunks = mosaic.chunks
+    xedges, yedges = set(np.cumsum(xchunks)), set(np.cumsum(ychunks))
+    with rio.open(tiles[0]) as src:
+        width, height = src.width, src.height
+    assert {width, 2 * width, 3 * width} <= xedges
+    assert {height, 2 * height, 3 * height} <= yedges
+    assert max(ychunks) <= 100
+    assert max(xchunks) <= 100
+
+
+def test_watcher_update(tiles: List[Path], tmp_path: Path) -> None:
+    """Test that the watcher only rewrite the vrt when the directory changes.
+
+    Args:
+        tiles: the list of tile path
+        tmp_path: the pytest temporary directory
+    """
+    for tile in tiles[:4]:
+        shutil.copy(tile, tmp_path / tile.name)
+
+    vrt_path = tmp_path / "watch.vrt"
+    watcher = rio_vrt.VrtWatcher(vrt_path, tmp_path, pattern="*.tiff")
+    assert watcher.update() is True
+    assert watcher.update() is False
+    files = sorted(tmp_path.glob("*.tiff"))
+    expected = rio_vrt.build_vrt(tmp_path / "expected.vrt", files).read_text()
+    assert vrt_path.read_text() == expected
+
+    # add and remove tiles
+    shutil.copy(tiles[4], tmp_path / tiles[4].name)
+    (tmp_path / tiles[0].name).unlink()
+    assert watcher.update() is True
+    files = sorted(tmp_path.glob("*.tiff"))
+    expected = rio_vrt.build_vrt(tmp_path / "expected.vrt", files).read_text()
+    assert vrt_path.read_text() == expected
+
+    # without any tile the last vrt is kept
+    [f.unlink() for f in files]
+    assert watcher.update() is True
+    assert vrt_path.read_text() == expected
+
+
+def test_watcher_write(tiles: List[Path], tmp_path: Path, monkeypatch) -> None:
+    """Test that the watcher keeps the vrt mode and cleans its temporary files.
+
+    Args:
+        tiles: the list of tile path
+        tmp_path: the pytest temporary directory
+        monkeypatch: the pytest monkeypatch fixture
+    """
+    shutil.copy(tiles[0], tmp_path / tiles[0].name)
+    vrt_path = tmp_path / "watch.vrt"
+    watcher = rio_vrt.VrtWatcher(vrt_path, tmp_path, pattern="*.tiff")
+    watcher.update()
+
+    # the mode of the existing vrt is kept
+    vrt_path.chmod(0o640)
+    shutil.copy(tiles[1], tmp_path / tiles[1].name)
+    watcher.update()
+    assert vrt_path.stat().st_mode & 0o777 == 0o640
+
+    # a failed write doesn't leave a temporary file behind
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    shutil.copy(tiles[2], tmp_path / tiles[2].name)
+    with pytest.raises(OSError):
+        watcher.update()
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_watcher_wrong_crs(tiles: List[Path], tmp_path: Path, caplog) -> None:
+    """Test that the watcher leaves out a file with a different crs and keeps working.
+
+    Args:
+        tiles: the list of tile path
+        tmp_path: the pytest temporary directory
+        caplog: the pytest log capture fixture
+    """
+    shutil.copy(tiles[0], tmp_path / tiles[0].name)
+    vrt_path = tmp_path / "watch.vrt"
+    watcher = rio_vrt.VrtWatcher(vrt_path, tmp_path, pattern="*.tiff")
+    assert watcher.update() is True
+
+    # drop a tile with a different crs in the directory
+    with rio.open(tiles[1]) as src:
+        kwargs = src.meta.copy()
+        kwargs.update(crs=CRS.from_epsg(4326))
+        data = src.read()
+
+    with rio.open(tmp_path / "wrong_crs.tiff", "w", **kwargs) as dst:
+        dst.write(data)
+
+    assert watcher.update() is True
+    assert "wrong_crs.tiff" in caplog.text
+    assert "wrong_crs.tiff" not in vrt_path.read_text()
+
+    # the watcher keeps on updating the vrt with the next valid tiles
+    shutil.copy(tiles[2], tmp_path / tiles[2].name)
+    assert watcher.update() is True
+    assert tiles[2].name in vrt_path.read_text()
+    assert "wrong_crs.tiff" not in vrt_path.read_text()
+
+
+def _wait_for_sources(vrt_path: Path, n: int, timeout: float = 10) -> bool:
+    """Poll the vrt until it contains n sources or the timeout is reached.
+
+    Args:
+        vrt_path: the vrt file
+        n: the expected number of sources
+        timeout: the maximum waiting time in seconds
+
+    Returns:
+        True if the vrt contains n sources before the timeout
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if vrt_path.exists() and vrt_path.read_text().count("<SourceFilename") == n:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.mark.parametrize("use_inotify", [False, True])
+def test_watcher_run(tiles: List[Path], tmp_path: Path, use_inotify: bool) -> None:
+    """Test that the running watcher picks up new tiles after the debounce time.
+
+    Args:
+        tiles: the list of tile path
+        tmp_path: the pytest temporary directory
+        use_inotify: use inotify instead of polling
+    """
+    if use_inotify:
+        pytest.importorskip("inotify_simple")
+
+    shutil.copy(tiles[0], tmp_path / tiles[0].name)
+    vrt_path = tmp_path / "watch.vrt"
+    watcher = rio_vrt.VrtWatcher(
+        vrt_path,
+        tmp_path,
+        pattern="*.tiff",
+        interval=0.05,
+        debounce=0.2,
+        use_inotify=use_inotify,
+    )
+
+    thread = threading.Thread(target=watcher.run)
+    thread.start()
+    try:
+        assert _wait_for_sources(vrt_path, 3)
+        shutil.copy(tiles[1], tmp_path / tiles[1].name)
+        assert _wait_for_sources(vrt_path, 6)
+    finally:
+        watcher.stop()
+        thread.join()
+
+
+def test_vrt_wrong_resampling(tiles: List[Path]) -> None:
+    """Test that not all keyword can be used as resampling.
+
+    Args:
+        tiles: the list of tile path
+    """
+    with pytest.raises(ValueError):
+        rio_vrt.build_vrt("error.vrt", tiles, resampling="error")
+
+
+def _half_resolution(tile: Path, dst_path: Path) -> Path:
+    """Write a copy of the tile at half its resolution.
+
+    Args:
+        tile: the tile path
+        dst_path: the path of the low resolution copy
+
+    Returns:
+        the path of the low resolution copy
+    """
+    with rio.open(tile) as src:
+        kwargs = src.profile.copy()
+        width, height = src.width // 2, src.height // 2
+        transform = src.transform * src.transform.scale(
+            src.width / width, src.height / height
+        )
+        kwargs.update(width=width, height=height, transform=transform)
+        data = src.read(out_shape=(src.count, height, width))
+
+    with rio.open(dst_path, "w", **kwargs) as dst:
+        dst.write(data)
+
+    return dst_path
+
+
+@pytest.mark.parametrize("res", ["highest", "lowest"])
+def test_vrt_multi_resolution(tiles: List[Path], tmp_path: Path, res: str) -> None:
+    """Test that sources with a different resolution are scaled in the vrt grid.
+
+    Args:
+        tiles: the list of tile path
+        tmp_path: the pytest temporary directory
+        res: the resolution parameter
+    """
+    # replace the first tile by the same tile at half its resolution
+    low_res = _half_resolution(tiles[0], tmp_path / "low_res.tiff")
+    files = [low_res] + tiles[1:]
+    vrt_path = tmp_path / "multi.vrt"
+    rio_vrt.build_vrt(vrt_path, files, res=res, resampling="bilinear")
+    vrt_tree = BeautifulSoup(vrt_path.read_text(), "xml")
+
+    with rio.open(vrt_path) as vrt, rio.open(tiles[0]) as tile:
+        high_res = vrt.res[0] == pytest.approx(tile.res[0])
+        assert high_res is (res == "highest")
+
+        # the low res tile covers the same number of vrt pixels as its neighbours
+        xsize = round(tile.width * tile.res[0] / vrt.res[0])
+        ysize = round(tile.height * tile.res[1] / vrt.res[1])
+
+    source = vrt_tree.find("SourceFilename", string=str(low_res)).parent
+    assert source["resampling"] == "bilinear"
+    assert int(source.DstRect["xSize"]) == pytest.approx(xsize, abs=1)
+    assert int(source.DstRect["ySize"]) == pytest.approx(ysize, abs=1)
+
+
+@pytest.mark.parametrize("chunksize", [37, 1024])
+def test_open_mosaic_resampled(
+    tiles: List[Path], tmp_path: Path, chunksize: int
+) -> None:
+    """Test that a resampled lazy mosaic reads the same values as the vrt whatever the chunks.
+
+    Args:
+        tiles: the list of tile path
+        tmp_path: the pytest temporary directory
+        chunksize: the size of the mosaic chunks
+    """
+    vrt_file = rio_vrt.build_vrt(tmp_path / "resampled.vrt", tiles, res=(500.0, 500.0))
+    with rio.open(vrt_file) as src:
+        expected = src.read()
+
+    mosaic = rio_vrt.open_mosaic(tiles, res=(500.0, 500.0), chunksize=chunksize)
+    assert np.array_equal(mosaic.values, expected)
+
+
+@pytest.mark.parametrize("resampling", ["nearest", "bilinear"])
+@pytest.mark.parametrize("chunksize", [37, 1024])
+def test_multi_resolution_read(
+    tiles: List[Path], tmp_path: Path, resampling: str, chunksize: int
+) -> None:
+    """Test the pixels read from a vrt and a lazy mosaic mixing resolutions.
+
+    Args:
+        tiles: the list of tile path
+        tmp_path: the pytest temporary directory
+        resampling: the resampling method
+        chunksize: the size of the mosaic chunks
+    """
+    low_res = _half_resolution(tiles[0], tmp_path / "low_res.tiff")
+    files = [low_res] + tiles[1:]
+    vrt_path = tmp_path / "multi.vrt"
+    rio_vrt.build_vrt(vrt_path, files, res="highest", resampling=resampling)
+    with rio.open(vrt_path) as src:
+        expected = src.read()
+
+    # the low res tile is resampled on its DstRect in the vrt
+    vrt_tree = BeautifulSoup(vrt_path.read_text(), "xml")
+    rect = vrt_tree.find("SourceFilename", string=str(low_res)).parent.DstRect
+    xoff, yoff = int(rect["xOff"]), int(rect["yOff"])
+    xsize, ysize = int(rect["xSize"]), int(rect["ySize"])
+    with rio.open(low_res) as src:
+        out_shape = (src.count, ysize, xsize)
+        data = src.read(out_shape=out_shape, resampling=Resampling[resampling])
+    assert np.array_equal(expected[:, yoff : yoff + ysize, xoff : xoff + xsize], data)
+
+    # the lazy mosaic reads the same values as the vrt
+    mosaic = rio_vrt.open_mosaic(
+        files, res="highest", chunksize=chunksize, resampling=resampling
+    )
+    assert np.array_equal(mosaic.values, expected)
+
+
+@pytest.mark.parametrize("use_inotify", [False, True])
+def test_watcher_run_error(
+    tiles: List[Path], tmp_path: Path, use_inotify: bool, monkeypatch
+) -> None:
+    """Test that the running watcher survives transient errors.
+
+    Args:
+        tiles: the list of tile path
+        tmp_path: the pytest temporary directory
+        use_inotify: use inotify instead of polling
+        monkeypatch: the pytest monkeypatch fixture
+    """
+    if use_inotify:
+        pytest.importorskip("inotify_simple")
+
+    shutil.copy(tiles[0], tmp_path / tiles[0].name)
+    vrt_path = tmp_path / "watch.vrt"
+    watcher = rio_vrt.VrtWatcher(
+        vrt_path,
+        tmp_path,
+        pattern="*.tiff",
+        interval=0.05,
+        debounce=0.2,
+        use_inotify=use_inotify,
+    )
+
+    # the first write fails, the next ones succeed
+    write, calls = watcher._write, []
+
+    def flaky_write(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        write(*args)
+
+    monkeypatch.setattr(watcher, "_write", flaky_write)
+
+    thread = threading.Thread(target=watcher.run)
+    thread.start()
+    try:
+        assert _wait_for_sources(vrt_path, 3)
+        shutil.copy(tiles[1], tmp_path / tiles[1].name)
+        assert _wait_for_sources(vrt_path, 6)
+        assert thread.is_alive()
+    finally:
+        watcher.stop()
+        thread.join()
+
+
+def test_watcher_vanishing_file(tiles: List[Path], tmp_path: Path, monkeypatch) -> None:
+    """Test that a file removed while listing the directory is skipped.
+
+    Args:
+        tiles: the list of tile path
+        tmp_path: the pytest temporary directory
+        monkeypatch: the pytest monkeypatch fixture
+    """
+    for tile in tiles[:2]:
+        shutil.copy(tile, tmp_path / tile.name)
+    vanishing = tmp_path / tiles[1].name
+
+    # remove the file right after it has been listed
+    is_file = Path.is_file
+
+    def remove_and_check(self):
+        result = is_file(self)
+        if self == vanishing:
+            self.unlink(missing_ok=True)
+        return result
+
+    monkeypatch.setattr(Path, "is_file", remove_and_check)
+
+    vrt_path = tmp_path / "watch.vrt"
+    watcher = rio_vrt.VrtWatcher(vrt_path, tmp_path, pattern="*.tiff")
+    assert watcher.update() is True
+    assert vrt_path.read_text().count("<SourceFilename") == 3